@@ -1,314 +1,269 @@
 import os
 import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output
+from dash import Patch, dcc, html
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+from flask_caching import Cache
 import wbdata
 import pandas as pd
+import numpy as np
 import datetime
-import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
 
-cache_file = 'wbdata_cache.pkl'
+cache_file = 'wbdata_cache.feather'
+legacy_cache_file = 'wbdata_cache.pkl'
 start_year, end_year = 2000, 2020
+scatter_top_n = 60
 data_date = (datetime.datetime(start_year, 1, 1), datetime.datetime(end_year, 1, 1))
 
+# Dash serializes figures through plotly.io, so this covers callback responses too
+pio.json.config.default_engine = 'orjson'
+
+
 indicators = {
     'NY.GDP.PCAP.CD': 'GDP per capita (current US$)',
     'SP.DYN.LE00.IN': 'Life expectancy at birth (years)',
     'SH.H2O.SMDW.ZS': 'Access to clean water (% pop)'
 }
 
+
 if os.path.exists(cache_file):
     print(f"Loading data from cache ({cache_file})...")
-    raw_df = pd.read_pickle(cache_file)
+    df = pd.read_feather(cache_file)
 else:
-    print("Fetching data from World Bank API...")
-    raw_df = wbdata.get_dataframe(indicators, date=data_date)
-    raw_df.to_pickle(cache_file)
+    if os.path.exists(legacy_cache_file):
+        print(f"Migrating pickle cache ({legacy_cache_file}) to {cache_file}...")
+        raw_df = pd.read_pickle(legacy_cache_file)
+    else:
+        print("Fetching data from World Bank API...")
+        raw_df = wbdata.get_dataframe(indicators, date=data_date)
+    # Feather stores a flat schema, so persist the frame with its index reset
+    df = raw_df.reset_index()
+    df.to_feather(cache_file, compression='uncompressed')
+
 
-df = raw_df.reset_index()
 if isinstance(df.loc[0, 'country'], dict):
-    df['iso2'] = df['country'].apply(lambda x: x.get('id'))
-    df['country_name'] = df['country'].apply(lambda x: x.get('value'))
+    country = pd.json_normalize(df['country'].tolist())
+    df['iso2'] = country['id'].to_numpy()
+    df['country_name'] = country['value'].to_numpy()
 else:
     df['iso2'] = df['country']
     df['country_name'] = df['country']
+
 df['Year'] = pd.to_datetime(df['date']).dt.year
+
 df.rename(columns=indicators, inplace=True)
 
-print("Loaded data for years:", df['Year'].min(), "to", df['Year'].max())
-print(df[['iso2', 'country_name', 'Year', 'GDP per capita (current US$)', 'Life expectancy at birth (years)']].head())
+# Drop country-years with no data for any indicator
+df = df.dropna(subset=list(indicators.values()), how='all').reset_index(drop=True)
 
-app = dash.Dash(__name__)
-app.layout = html.Div([
-    html.H1(f"World Bank Dashboard: {start_year}-{end_year}"),
-    html.Div([
-        dcc.Graph(id='gdp-life-scatter'),
-        dcc.Graph(id='water-access-bar')
-    ], style={'display': 'flex', 'justify-content': 'space-between'})
-])
+# Compact dtypes: fewer bytes to filter, group and serialize per callback
+df['iso2'] = df['iso2'].astype('category')
+df['country_name'] = df['country_name'].astype('category')
+df['Year'] = df['Year'].astype('int16')
+df[list(indicators.values())] = df[list(indicators.values())].astype('float32')
 
-@app.callback(
-    Output('gdp-life-scatter', 'figure'),
-    Output('water-access-bar', 'figure'),
-    Input('gdp-life-scatter', 'clickData'),
-    Input('water-access-bar', 'clickData')
-)
-def update_figures(click_scatter, click_bar):
-    dff = df.copy()
-    selected = []
-    if click_scatter:
-        selected = [pt['customdata'][0] for pt in click_scatter['points']]
-    elif click_bar:
-        selected = [pt['customdata'][0] for pt in click_bar['points']]
-    if selected:
-        dff = dff[dff['iso2'].isin(selected)]
 
-    # Chart 1: GDP vs Life Expectancy over time
-    fig1 = px.scatter(
-        dff,
-        x='GDP per capita (current US$)',
-        y='Life expectancy at birth (years)',
-        animation_frame='Year',
-        animation_group='iso2',
-        color='country_name',
-        custom_data=['iso2', 'country_name'],
+print(f"Loaded data for years: {df['Year'].min()} to {df['Year'].max()}")
+
+# Plottable GDP/life expectancy points, capped to the top scatter_top_n
+# countries by GDP per capita each year; the low-GDP cluster overlaps anyway
+scatter_cols = ['GDP per capita (current US$)', 'Life expectancy at birth (years)']
+scatter_df = df.dropna(subset=scatter_cols)
+scatter_df = scatter_df.sort_values(['Year', 'GDP per capita (current US$)'], ascending=[True, False])
+scatter_df = scatter_df.groupby('Year').head(scatter_top_n).reset_index(drop=True)
+
+# Latest-year water access; the bar chart takes the top 15 of a selection
+latest_df = df.loc[df['Year'] == end_year, ['iso2', 'country_name', 'Access to clean water (% pop)']]
+latest_df = latest_df.reset_index(drop=True)
+# Row positions of each country in latest_df, for O(k) selection lookups
+latest_rows = latest_df.groupby('iso2', observed=True).indices
+
+
+def animation_args(duration):
+    # scattergl traces are not tweened by plotly.js and are only repainted on
+    # redraw, so keep redraw on and skip the (no-op) transition between frames
+    return {
+        'frame': {'duration': duration, 'redraw': True},
+        'mode': 'immediate',
+        'fromcurrent': True,
+        'transition': {'duration': 0}
+    }
+
+
+def build_scatter(scatter_data):
+    # Year x country grids of contiguous float32 points, one column per trace
+    points = scatter_data.groupby(['Year', 'iso2'], sort=True, observed=True)[scatter_cols].first()
+    grid = points.unstack()
+    xs = grid['GDP per capita (current US$)'].to_numpy(dtype='float32')
+    ys = grid['Life expectancy at birth (years)'].to_numpy(dtype='float32')
+    years = grid.index
+    iso2s = grid['GDP per capita (current US$)'].columns
+    names = scatter_data.groupby('iso2', observed=True)['country_name'].first().loc[iso2s]
+
+    traces = [
+        go.Scattergl(
+            x=xs[0, j:j + 1],
+            y=ys[0, j:j + 1],
+            mode='markers',
+            name=name,
+            legendgroup=name,
+            text=[str(years[0])],
+            customdata=[[iso2, name]],
+            hovertemplate=(
+                f'country_name={name}<br>Year=%{{text}}<br>GDP per Capita (US$)=%{{x}}'
+                '<br>Life Expectancy (years)=%{y}<extra></extra>'
+            )
+        )
+        for j, (iso2, name) in enumerate(zip(iso2s, names))
+    ]
+    # Frames only carry the points and their year; everything else stays on
+    # the base traces
+    frames = [
+        go.Frame(
+            name=str(year),
+            data=[
+                go.Scattergl(x=xs[i, j:j + 1], y=ys[i, j:j + 1], text=[str(year)])
+                for j in range(len(traces))
+            ]
+        )
+        for i, year in enumerate(years)
+    ]
+
+    fig = go.Figure(data=traces, frames=frames)
+    fig.update_layout(
         title='GDP per Capita vs Life Expectancy (2000-2020)',
-        labels={
-            'GDP per capita (current US$)': 'GDP per Capita (US$)',
-            'Life expectancy at birth (years)': 'Life Expectancy (years)'
-        }
-    )
-    fig1.update_layout(clickmode='event+select')
-
-    # Chart 2: Clean Water Access by Country (latest year, top 15)
-    latest = dff[dff['Year'] == end_year]
-    bar_df = latest[['iso2', 'country_name', 'Access to clean water (% pop)']]
-    bar_df = bar_df.sort_values('Access to clean water (% pop)', ascending=False).head(15)
-    fig2 = px.bar(
-        bar_df,
-        x='country_name',
-        y='Access to clean water (% pop)',
-        custom_data=['iso2', 'country_name'],
-        title=f'Top 15 Countries by Clean Water Access ({end_year})',
-        labels={'Access to clean water (% pop)': 'Clean Water Access (%)'}
+        xaxis_title='GDP per Capita (US$)',
+        yaxis_title='Life Expectancy (years)',
+        legend={'title': {'text': 'country_name'}, 'tracegroupgap': 0},
+        clickmode='event+select',
+        updatemenus=[{
+            'type': 'buttons',
+            'direction': 'left',
+            'showactive': False,
+            'x': 0.1, 'xanchor': 'right', 'y': 0, 'yanchor': 'top',
+            'pad': {'r': 10, 't': 70},
+            'buttons': [
+                {'label': '&#9654;', 'method': 'animate', 'args': [None, animation_args(500)]},
+                {'label': '&#9724;', 'method': 'animate', 'args': [[None], animation_args(0)]}
+            ]
+        }],
+        sliders=[{
+            'active': 0,
+            'currentvalue': {'prefix': 'Year='},
+            'len': 0.9,
+            'x': 0.1, 'xanchor': 'left', 'y': 0, 'yanchor': 'top',
+            'pad': {'b': 10, 't': 60},
+            'steps': [
+                {'label': str(year), 'method': 'animate', 'args': [[str(year)], animation_args(0)]}
+                for year in years
+            ]
+        }]
     )
-    fig2.update_layout(xaxis_tickangle=-45, clickmode='event+select')
-
-    return fig1, fig2
-
-if __name__ == '__main__':
-    app.run(debug=True, use_reloader=False)# import os
-# import dash
-# from dash import dcc, html
-# from dash.dependencies import Input, Output
-# import wbdata
-# import pandas as pd
-# import datetime
-# import plotly.express as px
-
-# cache_file = 'wbdata_cache.pkl'
-# start_year, end_year = 2000, 2020
-# data_date = (datetime.datetime(start_year, 1, 1), datetime.datetime(end_year, 1, 1))
-
-# indicators = {
-#     'NY.GDP.PCAP.CD': 'GDP per capita (current US$)',
-#     'SP.DYN.LE00.IN': 'Life expectancy at birth (years)',
-#     'SH.H2O.SMDW.ZS': 'Access to clean water (% pop)'
-# }
-
-# if os.path.exists(cache_file):
-#     print(f"Loading data from cache ({cache_file})...")
-#     raw_df = pd.read_pickle(cache_file)
-# else:
-#     print("Fetching data from World Bank API...")
-#     raw_df = wbdata.get_dataframe(indicators, date=data_date)
-#     raw_df.to_pickle(cache_file)
-
-# df = raw_df.reset_index()
-# if isinstance(df.loc[0, 'country'], dict):
-#     df['iso2'] = df['country'].apply(lambda x: x.get('id'))
-#     df['country_name'] = df['country'].apply(lambda x: x.get('value'))
-# else:
-#     df['iso2'] = df['country']
-#     df['country_name'] = df['country']
-# df['Year'] = pd.to_datetime(df['date']).dt.year
-# df.rename(columns=indicators, inplace=True)
-
-# print("Loaded data for years:", df['Year'].min(), "to", df['Year'].max())
-# print(df[['iso2', 'country_name', 'Year', 'GDP per capita (current US$)', 'Life expectancy at birth (years)']].head())
-
-# app = dash.Dash(__name__)
-# server = app.server
-# app.layout = html.Div([
-#     html.H1(f"World Bank Dashboard: {start_year}-{end_year}"),
-#     html.Div([
-#         dcc.Graph(id='gdp-life-scatter'),
-#         dcc.Graph(id='water-access-bar')
-#     ], style={'display': 'flex', 'justify-content': 'space-between'})
-# ])
-
-# @app.callback(
-#     Output('gdp-life-scatter', 'figure'),
-#     Output('water-access-bar', 'figure'),
-#     Input('gdp-life-scatter', 'clickData'),
-#     Input('water-access-bar', 'clickData')
-# )
-# def update_figures(click_scatter, click_bar):
-#     dff = df.copy()
-#     selected = []
-#     if click_scatter:
-#         selected = [pt['customdata'][0] for pt in click_scatter['points']]
-#     elif click_bar:
-#         selected = [pt['customdata'][0] for pt in click_bar['points']]
-#     if selected:
-#         dff = dff[dff['iso2'].isin(selected)]
-
-#     # Chart 1: GDP vs Life Expectancy over time
-#     fig1 = px.scatter(
-#         dff,
-#         x='GDP per capita (current US$)',
-#         y='Life expectancy at birth (years)',
-#         animation_frame='Year',
-#         animation_group='iso2',
-#         color='country_name',
-#         custom_data=['iso2', 'country_name'],
-#         title='GDP per Capita vs Life Expectancy (2000-2020)',
-#         labels={
-#             'GDP per capita (current US$)': 'GDP per Capita (US$)',
-#             'Life expectancy at birth (years)': 'Life Expectancy (years)'
-#         }
-#     )
-#     fig1.update_layout(clickmode='event+select')
-
-#     # Chart 2: Clean Water Access by Country (latest year, top 15)
-#     latest = dff[dff['Year'] == end_year]
-#     bar_df = latest[['iso2', 'country_name', 'Access to clean water (% pop)']]
-#     bar_df = bar_df.sort_values('Access to clean water (% pop)', ascending=False).head(15)
-#     fig2 = px.bar(
-#         bar_df,
-#         x='country_name',
-#         y='Access to clean water (% pop)',
-#         custom_data=['iso2', 'country_name'],
-#         title=f'Top 15 Countries by Clean Water Access ({end_year})',
-#         labels={'Access to clean water (% pop)': 'Clean Water Access (%)'}
-#     )
-#     fig2.update_layout(xaxis_tickangle=-45, clickmode='event+select')
-
-#     return fig1, fig2
-
-# if __name__ == '__main__':
-#     app.run(debug=True, use_reloader=False)
+    return fig
 
 
-import os
-import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output
-import wbdata
-import pandas as pd
-import datetime
-import plotly.express as px
-
-cache_file = 'wbdata_cache.pkl'
-start_year, end_year = 2000, 2020
-data_date = (datetime.datetime(start_year, 1, 1), datetime.datetime(end_year, 1, 1))
-
-
-indicators = {
-    'NY.GDP.PCAP.CD': 'GDP per capita (current US$)',
-    'SP.DYN.LE00.IN': 'Life expectancy at birth (years)',
-    'SH.H2O.SMDW.ZS': 'Access to clean water (% pop)'
-}
-
-
-if os.path.exists(cache_file):
-    print(f"Loading data from cache ({cache_file})...")
-    raw_df = pd.read_pickle(cache_file)
-else:
-    print("Fetching data from World Bank API...")
-    raw_df = wbdata.get_dataframe(indicators, date=data_date)
-    raw_df.to_pickle(cache_file)
-
-
-df = raw_df.reset_index()
-
-if isinstance(df.loc[0, 'country'], dict):
-    df['iso2'] = df['country'].apply(lambda x: x.get('id'))
-    df['country_name'] = df['country'].apply(lambda x: x.get('value'))
-else:
-    df['iso2'] = df['country']
-    df['country_name'] = df['country']
+def build_figs(scatter_data, water_data):
+    # Chart 1: GDP vs Life Expectancy over time
+    fig1 = build_scatter(scatter_data)
 
-df['Year'] = pd.to_datetime(df['date']).dt.year
+    # Chart 2: Top 15 Countries by Clean Water Access in latest year
+    bar_df = water_data.nlargest(15, 'Access to clean water (% pop)')
+    fig2 = go.Figure(go.Bar(
+        x=bar_df['country_name'].to_numpy(),
+        y=bar_df['Access to clean water (% pop)'].to_numpy(),
+        customdata=bar_df[['iso2', 'country_name']].to_numpy(),
+        hovertemplate='country_name=%{x}<br>Clean Water Access (%)=%{y}<extra></extra>'
+    ))
+    fig2.update_layout(
+        title=f'Top 15 Countries by Clean Water Access ({end_year})',
+        xaxis_title='country_name',
+        yaxis_title='Clean Water Access (%)',
+        xaxis_tickangle=-45,
+        clickmode='event+select'
+    )
 
-df.rename(columns=indicators, inplace=True)
+    return fig1, fig2
 
 
-print(f"Loaded data for years: {df['Year'].min()} to {df['Year'].max()}")
+# Both figures are built once; callbacks only send patches against them
+base_fig1, base_fig2 = build_figs(scatter_df, latest_df)
+# fig1 has one trace per country, keyed here by iso2 in trace order
+trace_index = {trace.customdata[0][0]: i for i, trace in enumerate(base_fig1.data)}
 
 
 app = dash.Dash(__name__)
 server = app.server  # expose Flask server for Gunicorn
+cache = Cache(server, config={'CACHE_TYPE': 'SimpleCache'})
 app.layout = html.Div([
     html.H1(f"World Bank Dashboard: {start_year}-{end_year}"),
     html.Div([
-        dcc.Graph(id='gdp-life-scatter'),
-        dcc.Graph(id='water-access-bar')
-    ], style={'display': 'flex', 'justify-content': 'space-between'})
+        dcc.Graph(id='gdp-life-scatter', figure=base_fig1),
+        dcc.Graph(id='water-access-bar', figure=base_fig2)
+    ], style={'display': 'flex', 'justify-content': 'space-between'}),
+    # Last selection shown in this browser session
+    dcc.Store(id='selected-countries')
 ])
 
 
+# Trace visibility and bar rows for a sorted tuple of iso2 codes; repeat
+# selections are served from the cache
+@cache.memoize()
+def select_countries(selected_key):
+    if selected_key:
+        rows = [latest_rows[iso2] for iso2 in selected_key if iso2 in latest_rows]
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.intp)
+        water_df = latest_df.take(rows)
+    else:
+        water_df = latest_df
+    # Countries outside the scatter's top-N cap have no trace; if none of the
+    # selection is plotted, keep every trace rather than blank the scatter
+    plotted = [iso2 for iso2 in selected_key if iso2 in trace_index]
+    visible = [not plotted or iso2 in plotted for iso2 in trace_index]
+    return visible, water_df.nlargest(15, 'Access to clean water (% pop)')
+
+
 @app.callback(
     Output('gdp-life-scatter', 'figure'),
     Output('water-access-bar', 'figure'),
+    Output('selected-countries', 'data'),
     Input('gdp-life-scatter', 'clickData'),
-    Input('water-access-bar', 'clickData')
+    Input('water-access-bar', 'clickData'),
+    State('selected-countries', 'data'),
+    prevent_initial_call=True
 )
-def update_figures(click_scatter, click_bar):
-    dff = df.copy()
+def update_figures(click_scatter, click_bar, last_selected):
     selected = []
     if click_scatter:
         selected = [pt['customdata'][0] for pt in click_scatter['points']]
     elif click_bar:
         selected = [pt['customdata'][0] for pt in click_bar['points']]
-    if selected:
-        dff = dff[dff['iso2'].isin(selected)]
-
-    # Chart 1: GDP vs Life Expectancy over time
-    fig1 = px.scatter(
-        dff,
-        x='GDP per capita (current US$)',
-        y='Life expectancy at birth (years)',
-        animation_frame='Year',
-        animation_group='iso2',
-        color='country_name',
-        custom_data=['iso2', 'country_name'],
-        title='GDP per Capita vs Life Expectancy (2000-2020)',
-        labels={
-            'GDP per capita (current US$)': 'GDP per Capita (US$)',
-            'Life expectancy at birth (years)': 'Life Expectancy (years)'
-        }
-    )
-    fig1.update_layout(clickmode='event+select')
-
-    # Chart 2: Top 15 Countries by Clean Water Access in latest year
-    latest = dff[dff['Year'] == end_year]
-    water_df = latest[['country_name', 'Access to clean water (% pop)', 'iso2']]
-    water_df = water_df.sort_values('Access to clean water (% pop)', ascending=False).head(15)
-    fig2 = px.bar(
-        water_df,
-        x='country_name',
-        y='Access to clean water (% pop)',
-        custom_data=['iso2', 'country_name'],
-        title=f'Top 15 Countries by Clean Water Access ({end_year})',
-        labels={'Access to clean water (% pop)': 'Clean Water Access (%)'}
-    )
-    fig2.update_layout(xaxis_tickangle=-45, clickmode='event+select')
-
-    return fig1, fig2
+    selected_key = tuple(sorted(selected))
+    # Repeat clicks on the same point leave both figures as they are
+    if list(selected_key) == last_selected:
+        raise PreventUpdate
+    visible, bar_df = select_countries(selected_key)
+    # The figure currently shows last_selected (the base figure if unset)
+    shown, _ = select_countries(tuple(last_selected or ()))
+
+    # Chart 1: show only the selected countries' traces, patching just the
+    # traces whose visibility changes
+    fig1 = Patch()
+    for i, (is_visible, was_visible) in enumerate(zip(visible, shown)):
+        if is_visible != was_visible:
+            fig1['data'][i]['visible'] = is_visible
+
+    # Chart 2: swap in the top 15 of the selected countries
+    fig2 = Patch()
+    fig2['data'][0]['x'] = bar_df['country_name'].to_numpy()
+    fig2['data'][0]['y'] = bar_df['Access to clean water (% pop)'].to_numpy()
+    fig2['data'][0]['customdata'] = bar_df[['iso2', 'country_name']].to_numpy()
+
+    return fig1, fig2, list(selected_key)
 
 
 if __name__ == '__main__':
-    app.run(debug=True, use_reloader=False)
+    app.run(debug=True, use_reloader=False, threaded=True)
 
 